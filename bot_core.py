@@ -1,8 +1,19 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from datetime import datetime, time, timedelta
+import asyncio
+import json
+import os
+import sys
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from datetime import date, datetime, time, timedelta
+from time import time as _unix_time
+from types import MappingProxyType
 from typing import Dict, List, Optional, Tuple, Set
 import zoneinfo
+from collections import namedtuple
+
+import aiofiles
 
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.constants import ParseMode
@@ -13,29 +24,95 @@ from telegram.ext import (
 # ============ CONFIG ============
 TIMEZONE = zoneinfo.ZoneInfo("Asia/Kolkata")  # IST
 
-# Academic day boundaries & lunch
-EARLY_OPEN = time(9, 0, tzinfo=TIMEZONE)     # treat 9:00–9:30 as pre-class window
-COLLEGE_OPEN = time(9, 30, tzinfo=TIMEZONE)
-COLLEGE_CLOSE = time(17, 30, tzinfo=TIMEZONE)
-LUNCH_FROM = time(13, 30, tzinfo=TIMEZONE)
-LUNCH_TO = time(14, 30, tzinfo=TIMEZONE)
+# Academic day boundaries & lunch. Everything below is wall-clock IST;
+# the times are naive on purpose — attaching tzinfo made every rich
+# comparison resolve utcoffset() through zoneinfo for no benefit.
+EARLY_OPEN = time(9, 0)     # treat 9:00–9:30 as pre-class window
+COLLEGE_OPEN = time(9, 30)
+COLLEGE_CLOSE = time(17, 30)
+LUNCH_FROM = time(13, 30)
+LUNCH_TO = time(14, 30)
 
 # Canonical 1-hour slots (7 per day)
 SLOTS: List[Tuple[time, time]] = [
-    (time(9, 30, tzinfo=TIMEZONE), time(10, 30, tzinfo=TIMEZONE)),
-    (time(10, 30, tzinfo=TIMEZONE), time(11, 30, tzinfo=TIMEZONE)),
-    (time(11, 30, tzinfo=TIMEZONE), time(12, 30, tzinfo=TIMEZONE)),
-    (time(12, 30, tzinfo=TIMEZONE), time(13, 30, tzinfo=TIMEZONE)),
-    (time(14, 30, tzinfo=TIMEZONE), time(15, 30, tzinfo=TIMEZONE)),
-    (time(15, 30, tzinfo=TIMEZONE), time(16, 30, tzinfo=TIMEZONE)),
-    (time(16, 30, tzinfo=TIMEZONE), time(17, 30, tzinfo=TIMEZONE)),
+    (time(9, 30), time(10, 30)),
+    (time(10, 30), time(11, 30)),
+    (time(11, 30), time(12, 30)),
+    (time(12, 30), time(13, 30)),
+    (time(14, 30), time(15, 30)),
+    (time(15, 30), time(16, 30)),
+    (time(16, 30), time(17, 30)),
 ]
 
-@dataclass
+# Slot boundaries as minute-of-day ints, kept in sync with SLOTS. Hot loops
+# compare these instead of allocating tz-aware datetimes per iteration.
+SLOT_MINUTES: Tuple[Tuple[int, int], ...] = tuple(
+    (s.hour * 60 + s.minute, e.hour * 60 + e.minute) for s, e in SLOTS
+)
+
+# (hour, minute) per slot start, for building aware datetimes in one go.
+SLOT_HM: Tuple[Tuple[int, int], ...] = tuple((s.hour, s.minute) for s, _ in SLOTS)
+
+# Slot-start minutes alone, for bisecting "first slot still ahead of now".
+_START_MINUTES: Tuple[int, ...] = tuple(s for s, _ in SLOT_MINUTES)
+
+# _MASK_FROM[k]: 7-bit mask keeping slots k and later (so the today-only
+# filter in the next-class scan is a table read, not a shift).
+_MASK_FROM: Tuple[int, ...] = tuple(0x7F & (-1 << k) for k in range(8))
+
+# Plain "HH:MM" start labels (the Markdown ones live in SLOT_LABELS).
+_START_HHMM: Tuple[str, ...] = tuple(f"{h:02d}:{m:02d}" for h, m in SLOT_HM)
+
+# Bisect table for slot lookup: _BOUNDS holds every slot edge in
+# seconds-of-day and _SLOT_AT maps the region after each edge to its slot
+# index, with -1 marking gaps (lunch). _CLOSE_S is the end of the last slot.
+def _build_slot_table() -> Tuple[Tuple[int, ...], Tuple[int, ...], int]:
+    bounds: List[int] = []
+    slot_at: List[int] = []
+    e_s = 0
+    for i, (s, e) in enumerate(SLOTS):
+        bounds.append(s.hour * 3600 + s.minute * 60)
+        slot_at.append(i)
+        e_s = e.hour * 3600 + e.minute * 60
+        if i + 1 < len(SLOTS):
+            n = SLOTS[i + 1][0]
+            if n.hour * 3600 + n.minute * 60 != e_s:
+                bounds.append(e_s)
+                slot_at.append(-1)
+    return tuple(bounds), tuple(slot_at), e_s
+
+_BOUNDS, _SLOT_AT, _CLOSE_S = _build_slot_table()
+
+FACULTY = {
+    "AIML": "Dr. Priya Rao (CSE)",
+    "WT": "Subhrasmita Gouda (CSE)",
+    "OS": "Dr. Ashish Ranjan (CSIT)",
+    "DMDW": "Dr. Bichitrananda Behera (CSE)",
+}
+
+@dataclass(frozen=True, slots=True)
 class ClassEntry:
     subject: str
     room: str
     teacher: Optional[str] = None
+    # Display string, rendered exactly once when the entry is constructed.
+    pretty: str = field(init=False, default="")
+
+    def __post_init__(self):
+        t = FACULTY.get(self.subject.split()[0])
+        tp = f"\n    👨‍🏫 {t}" if t else ""
+        object.__setattr__(self, "pretty", f"📘 {self.subject} @ {self.room}{tp}")
+
+# Intern entries so repeated slots (e.g. a 3-hour lab) share one object —
+# fewer live objects and one pretty-string render per unique entry.
+_ENTRY_CACHE: Dict[Tuple[str, str, Optional[str]], ClassEntry] = {}
+
+def _E(subject: str, room: str, teacher: Optional[str] = None) -> ClassEntry:
+    key = (subject, room, teacher)
+    entry = _ENTRY_CACHE.get(key)
+    if entry is None:
+        entry = _ENTRY_CACHE[key] = ClassEntry(subject, room, teacher)
+    return entry
 
 # -----------------------------
 # WEEK SCHEDULE (7 slots/day)
@@ -43,61 +120,74 @@ class ClassEntry:
 # Each day MUST have exactly 7 entries (None allowed).
 SCHEDULE: Dict[int, List[Optional[ClassEntry]]] = {
     0: [  # MON
-        ClassEntry("DMDW", "BS-102"),
-        ClassEntry("OS", "BS-102"),
-        ClassEntry("AIML", "BS-102"),
-        ClassEntry("WT", "BS-102"),
-        ClassEntry("DMDW LAB", "MBA Gallary"),
-        ClassEntry("DMDW LAB", "MBA Gallary"),
-        ClassEntry("DMDW LAB", "MBA Gallary"),
+        _E("DMDW", "BS-102"),
+        _E("OS", "BS-102"),
+        _E("AIML", "BS-102"),
+        _E("WT", "BS-102"),
+        _E("DMDW LAB", "MBA Gallary"),
+        _E("DMDW LAB", "MBA Gallary"),
+        _E("DMDW LAB", "MBA Gallary"),
     ],
     1: [  # TUE
-        ClassEntry("OS", "BS-104"),
-        ClassEntry("WT LAB", "BS-104"),
-        ClassEntry("WT LAB", "BS-104"),
-        ClassEntry("WT LAB", "BS-104"),
-        ClassEntry("DMDW", "CS-201"),
-        ClassEntry("AIML", "CS-201"),
-        ClassEntry("AIML", "CS-201"),
+        _E("OS", "BS-104"),
+        _E("WT LAB", "BS-104"),
+        _E("WT LAB", "BS-104"),
+        _E("WT LAB", "BS-104"),
+        _E("DMDW", "CS-201"),
+        _E("AIML", "CS-201"),
+        _E("AIML", "CS-201"),
     ],
     2: [  # WED
-        ClassEntry("SDE", "Chutti"),
-        ClassEntry("SDE", "Chutti"),
-        ClassEntry("SDE", "Chutti"),
+        _E("SDE", "Chutti"),
+        _E("SDE", "Chutti"),
+        _E("SDE", "Chutti"),
         None,
-        ClassEntry("CDT", "7A-ME-205,7B-EE-302"),
-        ClassEntry("CDT", "7A-ME-205,7B-EE-302"),
-        ClassEntry("CDT", "7A-ME-205,7B-EE-302"),
+        _E("CDT", "7A-ME-205,7B-EE-302"),
+        _E("CDT", "7A-ME-205,7B-EE-302"),
+        _E("CDT", "7A-ME-205,7B-EE-302"),
     ],
     3: [  # THU
-        ClassEntry("WT", "Oracle Lab"),
-        ClassEntry("AIML LAB", "Oracle Lab"),
-        ClassEntry("AIML LAB", "Oracle Lab"),
-        ClassEntry("AIML LAB", "Oracle Lab"),
-        ClassEntry("DMDW", "BS-403"),
-        ClassEntry("AIML", "BS-403"),
-        ClassEntry("OS", "BS-403"),
+        _E("WT", "Oracle Lab"),
+        _E("AIML LAB", "Oracle Lab"),
+        _E("AIML LAB", "Oracle Lab"),
+        _E("AIML LAB", "Oracle Lab"),
+        _E("DMDW", "BS-403"),
+        _E("AIML", "BS-403"),
+        _E("OS", "BS-403"),
     ],
     4: [  # FRI
-        ClassEntry("DMDW", "CS-201"),
-        ClassEntry("OS", "CS-201"),
-        ClassEntry("WT", "CS-201"),
-        ClassEntry("WT", "CS-201"),
-        ClassEntry("OS LAB", "MECH DC"),
-        ClassEntry("OS LAB", "MECH DC"),
-        ClassEntry("OS LAB", "MECH DC"),
+        _E("DMDW", "CS-201"),
+        _E("OS", "CS-201"),
+        _E("WT", "CS-201"),
+        _E("WT", "CS-201"),
+        _E("OS LAB", "MECH DC"),
+        _E("OS LAB", "MECH DC"),
+        _E("OS LAB", "MECH DC"),
     ],
     5: [None, None, None, None, None, None, None],  # SAT (co-curricular only)
     6: [None, None, None, None, None, None, None],  # SUN closed
 }
 
-SUPPORTED_GROUPS = {"Group-7": SCHEDULE}
+# Read-only after import: the proxy guarantees no handler mutates the
+# group table and keeps lookups on the plain hash-read path.
+SUPPORTED_GROUPS = MappingProxyType({"Group-7": SCHEDULE})
 
-FACULTY = {
-    "AIML": "Dr. Priya Rao (CSE)",
-    "WT": "Subhrasmita Gouda (CSE)",
-    "OS": "Dr. Ashish Ranjan (CSIT)",
-    "DMDW": "Dr. Bichitrananda Behera (CSE)",
+# Flat week layout: one 49-element tuple per group, indexed day*7 + slot.
+# Hot scans do a single index instead of dict + day-list + slot-list lookups.
+_FLAT_SCHEDULE: Dict[str, Tuple[Optional[ClassEntry], ...]] = {
+    g: tuple(e for day in range(7) for e in sched[day])
+    for g, sched in SUPPORTED_GROUPS.items()
+}
+
+# 7-bit occupancy mask per day (bit i set iff slot i has a class). Scans
+# test/skip whole days with one int and find the next class with a single
+# lowest-set-bit extraction instead of per-slot None checks.
+PRESENT_MASK: Dict[str, Tuple[int, ...]] = {
+    g: tuple(
+        sum(1 << i for i in range(7) if flat[day * 7 + i] is not None)
+        for day in range(7)
+    )
+    for g, flat in _FLAT_SCHEDULE.items()
 }
 
 DEVELOPER_TEXT = (
@@ -108,7 +198,7 @@ DEVELOPER_TEXT = (
 )
 
 # ===== Admins (fill with your Telegram numeric user IDs) =====
-ADMIN_IDS: Set[int] = {1255061320}
+ADMIN_IDS: frozenset[int] = frozenset({1255061320})
 
 # Track chats we can broadcast to (users or groups that interacted)
 KNOWN_CHATS: Set[int] = set()
@@ -117,24 +207,66 @@ KNOWN_CHATS: Set[int] = set()
 def ist_now() -> datetime:
     return datetime.now(TIMEZONE)
 
+def _slot_dt(d: date, i: int) -> datetime:
+    """Aware datetime for the start of slot `i` on day `d`, built in one
+    allocation (the combine + replace(tzinfo=...) dance needs two)."""
+    h, m = SLOT_HM[i]
+    return datetime(d.year, d.month, d.day, h, m, tzinfo=TIMEZONE)
+
+# datetime.now(tz) walks zoneinfo and allocates a datetime on every call.
+# Handlers that only need the weekday/date can derive them from time.time()
+# plus a UTC offset cached per local day (IST has no DST, so the refresh is
+# belt and braces).
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_TZ_OFFSET_CACHE: Optional[Tuple[int, int]] = None  # (local_epoch_day, offset_seconds)
+
+def _ist_components() -> Tuple[int, int, date]:
+    """Return (weekday, seconds_of_day, date) in IST without building a datetime."""
+    global _TZ_OFFSET_CACHE
+    t = int(_unix_time())
+    if _TZ_OFFSET_CACHE is not None:
+        day, off = _TZ_OFFSET_CACHE
+        local = t + off
+        d = local // 86400
+        if d == day:
+            return (d + 3) % 7, local % 86400, date.fromordinal(d + _EPOCH_ORDINAL)
+    off = int(datetime.now(TIMEZONE).utcoffset().total_seconds())
+    local = t + off
+    d = local // 86400
+    _TZ_OFFSET_CACHE = (d, off)
+    # Derive the date from the same time.time() read as weekday/seconds —
+    # a second clock read could straddle midnight and disagree.
+    return (d + 3) % 7, local % 86400, date.fromordinal(d + _EPOCH_ORDINAL)  # epoch day 0 was a Thursday
+
 def slot_index_for(now: Optional[datetime] = None) -> Optional[int]:
+    """Map a moment to its slot index with one bisect over slot edges.
+
+    _BOUNDS/_SLOT_AT are derived from SLOTS, so this stays correct if the
+    grid ever changes; seconds-of-day resolution means a class that ends
+    at 10:30:00 is over at 10:30:00 sharp, and gaps (lunch) are handled
+    by the -1 markers in the table rather than an extra end comparison.
+    """
     now = now or ist_now()
-    for i, (start, end) in enumerate(SLOTS):
-        if start <= now.timetz() < end:
-            return i
-    return None
+    s = now.hour * 3600 + now.minute * 60 + now.second
+    if s >= _CLOSE_S:
+        return None
+    i = bisect_right(_BOUNDS, s) - 1
+    if i < 0:
+        return None
+    idx = _SLOT_AT[i]
+    return None if idx < 0 else idx
 
 def pretty_slot_label(start: time, end: time) -> str:
     return f"🕒 *{start.strftime('%H:%M')}–{end.strftime('%H:%M')}*"
 
+# Display labels per slot, rendered once.
+SLOT_LABELS: Tuple[str, ...] = tuple(pretty_slot_label(s, e) for s, e in SLOTS)
+
 def pretty_entry(entry: ClassEntry) -> str:
-    sub_key = entry.subject.split()[0]
-    teacher = FACULTY.get(sub_key)
-    t = f"\n    👨‍🏫 {teacher}" if teacher else ""
-    return f"📘 {entry.subject} @ {entry.room}{t}"
+    return entry.pretty
 
-def day_schedule(group: str, day_idx: int) -> str:
-    """Return a nicely formatted schedule for a day (with a lunch line)."""
+def _day_schedule_impl(group: str, day_idx: int) -> str:
+    """Build a nicely formatted schedule for a day (with a lunch line)."""
     parts: List[str] = []
     for i, (start, end) in enumerate(SLOTS):
         entry = SUPPORTED_GROUPS[group][day_idx][i]
@@ -146,269 +278,470 @@ def day_schedule(group: str, day_idx: int) -> str:
             parts.append("🍴 *13:30–14:30: Lunch Break*")
     return "\n\n".join(parts)
 
-def current_class(group: str, now: Optional[datetime] = None) -> Optional[ClassEntry]:
-    now = now or ist_now()
+# SCHEDULE is static, so render each day exactly once at import time and
+# serve /today, /tomorrow and /week straight from this cache.
+_DAY_CACHE: Dict[str, List[str]] = {
+    g: [_day_schedule_impl(g, d) for d in range(7)] for g in SUPPORTED_GROUPS
+}
+
+def day_schedule(group: str, day_idx: int) -> str:
+    """Return the pre-rendered schedule string for a day."""
+    return _DAY_CACHE[group][day_idx]
+
+_DAY_LABELS: Tuple[str, ...] = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+def _build_week(group: str) -> str:
+    parts: List[str] = []
+    for d in range(7):
+        parts.append(f"*{_DAY_LABELS[d]}*")
+        parts.append(_DAY_CACHE[group][d])
+        if d < 6:
+            parts.append("")  # extra blank line between days
+    return "\n".join(parts)
+
+# The /week reply is likewise static — join it once at import.
+_WEEK_CACHE: Dict[str, str] = {g: _build_week(g) for g in SUPPORTED_GROUPS}
+
+def current_class(group: str, now: datetime) -> Optional[ClassEntry]:
+    """Entry for the slot containing `now` (caller supplies the timestamp
+    so one handler invocation never hits `datetime.now` twice)."""
     idx = slot_index_for(now)
     if idx is None:
         return None
-    schedule = SUPPORTED_GROUPS.get(group)
-    if not schedule:
+    flat = _FLAT_SCHEDULE.get(group)
+    if flat is None:
         return None
-    return schedule[now.weekday()][idx]
+    return flat[now.weekday() * 7 + idx]
+
+@lru_cache(maxsize=4096)
+def _next_class_scan(group: str, weekday: int, minute_of_day: int, date_ordinal: int) -> Optional[Tuple[int, int, int]]:
+    """Memoized scan: (target date ordinal, day index, slot index) or None.
+
+    Keyed on plain ints so everything is hashable and the date ordinal
+    makes stale entries unreachable — no explicit invalidation needed.
+    Within one minute, /where, /next and the reminder path all hit the
+    same cache line instead of redoing the mask walk.
+    """
+    masks = PRESENT_MASK.get(group)
+    if masks is None:
+        return None
+    # First slot whose start is still ahead of now (today only).
+    first = bisect_right(_START_MINUTES, minute_of_day)
+    for dshift in range(0, 7):
+        day_idx = (weekday + dshift) % 7
+        mask = masks[day_idx]
+        if not mask:
+            continue  # whole day empty (Sat/Sun) — one int test, no slot work
+        if dshift == 0:
+            mask &= _MASK_FROM[first]
+            if not mask:
+                continue  # today's remaining slots are all free
+        i = (mask & -mask).bit_length() - 1  # lowest set bit = next slot
+        return date_ordinal + dshift, day_idx, i
+    return None
 
 def next_class(group: str, now: Optional[datetime] = None) -> Optional[Tuple[datetime, ClassEntry]]:
     """Robust next-class finder across lunch, gaps, and day rolls."""
     now = now or ist_now()
-    schedule = SUPPORTED_GROUPS.get(group)
-    if not schedule:
+    found = _next_class_scan(group, now.weekday(), now.hour * 60 + now.minute, now.date().toordinal())
+    if found is None:
         return None
-    for dshift in range(0, 7):
-        day_idx = (now.weekday() + dshift) % 7
-        base_date = now.date() + timedelta(days=dshift)
-        for i in range(len(SLOTS)):
-            start_dt = datetime.combine(base_date, SLOTS[i][0]).replace(tzinfo=TIMEZONE)
-            if dshift == 0 and start_dt <= now:
-                continue
-            entry = schedule[day_idx][i]
-            if entry:
-                return start_dt, entry
-    return None
+    target_ordinal, day_idx, i = found
+    # Only the winning slot pays for a datetime construction.
+    return _slot_dt(date.fromordinal(target_ordinal), i), _FLAT_SCHEDULE[group][day_idx * 7 + i]
 
 # ================= Persistence =================
 USER_GROUP: Dict[int, str] = {}
 
+# Append-only JSON-lines state file so KNOWN_CHATS/USER_GROUP survive
+# restarts. New records are queued in memory and flushed in batches by
+# state_flusher() — no per-message disk I/O.
+STATE_FILE = os.environ.get("STATE_FILE", "bot_state.jsonl")
+FLUSH_INTERVAL = 5  # seconds between coalesced writes
+_PENDING: List[str] = []  # serialized records awaiting flush
+
+def _queue_state(record: dict) -> None:
+    _PENDING.append(json.dumps(record) + "\n")
+
+def load_state() -> None:
+    """Replay the state file into memory. Call once at startup."""
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                    if "chat" in rec:
+                        KNOWN_CHATS.add(rec["chat"])
+                    elif "user" in rec:
+                        USER_GROUP[rec["user"]] = rec["group"]
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # Torn or corrupt line (e.g. killed mid-append), or
+                    # valid JSON that isn't an object. The record is
+                    # re-discoverable on the next interaction, so skip it
+                    # rather than crash-loop at startup.
+                    continue
+    except FileNotFoundError:
+        pass
+
+async def flush_state() -> None:
+    """Append all queued records to STATE_FILE now."""
+    if not _PENDING:
+        return
+    batch = _PENDING[:]
+    async with aiofiles.open(STATE_FILE, "a", encoding="utf-8") as f:
+        await f.write("".join(batch))
+    # Drop only what was written; records queued while the write was in
+    # flight stay for the next flush. On a write error nothing is dropped.
+    del _PENDING[:len(batch)]
+
+async def state_flusher() -> None:
+    """Background task: flush queued records in batches."""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await flush_state()
+        except Exception:
+            # Disk hiccup (full, permissions, ...): keep the task alive
+            # and the records queued; retry on the next interval.
+            pass
+
 # ================= UI & Handlers =================
-MAIN_KEYBOARD = ReplyKeyboardMarkup(
+class _CachedMarkup(ReplyKeyboardMarkup):
+    """Keyboard whose layout never changes — serialize it to a dict once
+    instead of on every reply_text call."""
+    _cached_dict: Optional[dict] = None
+
+    def to_dict(self, *args, **kwargs):
+        if _CachedMarkup._cached_dict is None:
+            _CachedMarkup._cached_dict = super().to_dict(*args, **kwargs)
+        return _CachedMarkup._cached_dict
+
+MAIN_KEYBOARD = _CachedMarkup(
     [[KeyboardButton("Where is the class?"), KeyboardButton("Who is the developer?")]],
     resize_keyboard=True,
 )
 
-async def _remember_chat(update: Update):
-    KNOWN_CHATS.add(update.effective_chat.id)
+START_TEXT = (
+    "*Welcome!* You are registered under *Group-7*.\n\n"
+    "• /today – today’s timetable\n"
+    "• /next – next class from now\n"
+    "• /subscribe – reminders 10 min before each class today\n"
+    "• /tomorrow – tomorrow’s timetable\n"
+    "• /week – week at a glance\n"
+    "• /setgroup <name> – change group\n"
+    "• /announce <msg> – admin broadcast\n"
+    "• /help – command list"
+)
+
+HELP_TEXT = (
+    "*Commands*\n\n"
+    "• /today – today’s timetable\n"
+    "• /next – next class from now\n"
+    "• /subscribe – reminders 10 min before each class today\n"
+    "• /tomorrow – tomorrow’s timetable\n"
+    "• /week – week at a glance\n"
+    "• /announce <msg> – admin broadcast\n"
+    "• /setgroup <name> – change your group\n"
+    "• /help – this help"
+)
+
+# Intern the hot static payloads so every send reuses one shared string
+# object (hash computed once, no duplicate copies on the heap).
+START_TEXT = sys.intern(START_TEXT)
+HELP_TEXT = sys.intern(HELP_TEXT)
+DEVELOPER_TEXT = sys.intern(DEVELOPER_TEXT)
+
+def _remember_chat(update: Update) -> None:
+    # Plain function: a set.add doesn't need a coroutine object per message.
+    cid = update.effective_chat.id
+    if cid not in KNOWN_CHATS:
+        KNOWN_CHATS.add(cid)
+        _queue_state({"chat": cid})
+
+# Per-update context resolved once: remembers the chat, looks up the
+# user's group and reads the IST clock a single time, instead of each
+# handler redoing the same attribute chains and dict lookups.
+_Ctx = namedtuple("_Ctx", "uid chat_id group weekday seconds date")
+
+def _ctx(update: Update) -> _Ctx:
+    _remember_chat(update)
+    user = update.effective_user
+    uid = user.id if user else 0
+    weekday, seconds, d = _ist_components()
+    return _Ctx(uid, update.effective_chat.id, USER_GROUP.get(uid, "Group-7"), weekday, seconds, d)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _remember_chat(update)
+    _remember_chat(update)
     user = update.effective_user
     if user and user.id not in USER_GROUP:
         USER_GROUP[user.id] = "Group-7"
-    text = (
-        "*Welcome!* You are registered under *Group-7*.\n\n"
-        "• /today – today’s timetable\n"
-        "• /next – next class from now\n"
-        "• /subscribe – reminders 10 min before each class today\n"
-        "• /tomorrow – tomorrow’s timetable\n"
-        "• /week – week at a glance\n"
-        "• /setgroup <name> – change group\n"
-        "• /announce <msg> – admin broadcast\n"
-        "• /help – command list"
-    )
-    await update.message.reply_text(text, reply_markup=MAIN_KEYBOARD, parse_mode=ParseMode.MARKDOWN)
+        _queue_state({"user": user.id, "group": "Group-7"})
+    await update.message.reply_text(START_TEXT, reply_markup=MAIN_KEYBOARD, parse_mode=ParseMode.MARKDOWN)
 
 async def setgroup(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _remember_chat(update)
+    _remember_chat(update)
+    msg = update.message  # effective_* and message are PTB properties; read once
     if not context.args:
-        await update.message.reply_text("*Usage:* /setgroup Group-7", parse_mode=ParseMode.MARKDOWN)
+        await msg.reply_text("*Usage:* /setgroup Group-7", parse_mode=ParseMode.MARKDOWN)
         return
     group = " ".join(context.args)
     if group not in SUPPORTED_GROUPS:
-        await update.message.reply_text(
+        await msg.reply_text(
             f"Unknown group '{group}'. Supported: {', '.join(SUPPORTED_GROUPS.keys())}",
             parse_mode=ParseMode.MARKDOWN,
         )
         return
-    USER_GROUP[update.effective_user.id] = group
-    await update.message.reply_text(f"Updated your group to *{group}*.", parse_mode=ParseMode.MARKDOWN)
+    uid = update.effective_user.id
+    USER_GROUP[uid] = group
+    _queue_state({"user": uid, "group": group})
+    await msg.reply_text(f"Updated your group to *{group}*.", parse_mode=ParseMode.MARKDOWN)
 
 async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _remember_chat(update)
-    text = (
-        "*Commands*\n\n"
-        "• /today – today’s timetable\n"
-        "• /next – next class from now\n"
-        "• /subscribe – reminders 10 min before each class today\n"
-        "• /tomorrow – tomorrow’s timetable\n"
-        "• /week – week at a glance\n"
-        "• /announce <msg> – admin broadcast\n"
-        "• /setgroup <name> – change your group\n"
-        "• /help – this help"
-    )
-    await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
+    _remember_chat(update)
+    await update.message.reply_text(HELP_TEXT, parse_mode=ParseMode.MARKDOWN)
+
+async def developer_reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    _remember_chat(update)
+    await update.message.reply_text(DEVELOPER_TEXT, parse_mode=ParseMode.MARKDOWN)
+
+async def unknown_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Catch-all for text that matched no intent filter."""
+    _remember_chat(update)
+    await update.message.reply_text("Please use the provided buttons or /help.")
+
+# --- where_is_class as a classify-then-dispatch state machine ---
+# States: 0=Sunday, 1=before first slot, 2=lunch, 3=after last slot,
+# 4=within class hours. One arithmetic classification replaces the old
+# cascade of tz-aware time comparisons.
+def _classify(now: datetime) -> int:
+    if now.weekday() == 6:
+        return 0
+    m = now.hour * 60 + now.minute
+    if m < 570:       # before 09:30 (incl. the 09:00–09:30 pre-class window)
+        return 1
+    if m < 810:       # morning slots
+        return 4
+    if m < 870:       # lunch 13:30–14:30
+        return 2
+    if m < 1050:      # afternoon slots
+        return 4
+    return 3          # from 17:30
+
+# Static fragments of the hot reply templates: only the timestamp and the
+# (precomputed) entry string vary per reply, so concatenate around these
+# constants instead of rebuilding the fixed text in an f-string each time.
+_SUNDAY_NONE = "Sunday: No classes."
+_SUNDAY_NEXT_PREFIX = "Sunday: No classes.\n\n*Next:* "
+_FIRST_PREFIX = "*First class "
+_LUNCH_PREFIX = "🍴 *Lunch (13:30–14:30)*\n\n*Next "
+_LUNCH_NONE = "🍴 *Lunch (13:30–14:30)*\n\nNo more classes today."
+_DONE_NONE = "No more classes today."
+_DONE_NEXT_PREFIX = "No more classes today.\n\n*Next:* "
+_NEXT_PREFIX = "*Next "
+
+def _sunday_msg(group: str, now: datetime) -> str:
+    nxt = next_class(group, now)
+    if nxt:
+        when, entry = nxt
+        return _SUNDAY_NEXT_PREFIX + when.strftime('%a %H:%M') + "\n" + entry.pretty
+    return _SUNDAY_NONE
+
+def _prefirst_msg(group: str, now: datetime) -> str:
+    when, entry = next_class(group, now)
+    return _FIRST_PREFIX + when.strftime('%H:%M') + "*\n" + entry.pretty
+
+def _lunch_msg(group: str, now: datetime) -> str:
+    nxt = next_class(group, now)
+    if nxt:
+        when, entry = nxt
+        return _LUNCH_PREFIX + when.strftime('%H:%M') + "*\n" + entry.pretty
+    return _LUNCH_NONE
+
+def _afterlast_msg(group: str, now: datetime) -> str:
+    nxt = next_class(group, now)
+    if nxt:
+        when, entry = nxt
+        return _DONE_NEXT_PREFIX + when.strftime('%a %H:%M') + "\n" + entry.pretty
+    return _DONE_NONE
+
+def _inslot_msg(group: str, now: datetime) -> str:
+    cur = current_class(group, now)
+    if cur:
+        idx = slot_index_for(now)
+        return "*Current* " + SLOT_LABELS[idx] + "\n" + cur.pretty
+    nxt = next_class(group, now)
+    if nxt:
+        when, entry = nxt
+        return _NEXT_PREFIX + when.strftime('%H:%M') + "*\n" + entry.pretty
+    return "No class right now."
 
-async def text_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _remember_chat(update)
-    text = (update.message.text or "").strip().lower()
-    if "where is the class" in text:
-        await where_is_class(update, context)
-    elif "who is the developer" in text:
-        await update.message.reply_text(DEVELOPER_TEXT, parse_mode=ParseMode.MARKDOWN)
-    else:
-        await update.message.reply_text("Please use the provided buttons or /help.")
+_STATE_MSG = (_sunday_msg, _prefirst_msg, _lunch_msg, _afterlast_msg, _inslot_msg)
 
 async def where_is_class(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _remember_chat(update)
-    user_id = update.effective_user.id
-    group = USER_GROUP.get(user_id, "Group-7")
+    c = _ctx(update)
     now = ist_now()
-    wk = now.weekday()
-
-    # Sunday: closed, but offer next class
-    if wk == 6:
-        nxt = next_class(group, now)
-        if nxt:
-            when, entry = nxt
-            msg = f"Sunday: No classes.\n\n*Next:* {when.strftime('%a %H:%M')}\n{pretty_entry(entry)}"
-        else:
-            msg = "Sunday: No classes."
-        await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
-        return
-
-    # Before first slot (incl. 09:00–09:30): don’t say closed; show first class
-    first_start = SLOTS[0][0]
-    if now.timetz() < first_start:
-        when, entry = next_class(group, now)
-        msg = f"*First class {when.strftime('%H:%M')}*\n{pretty_entry(entry)}"
-        await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
-        return
-
-    # Lunch window → show next class
-    if LUNCH_FROM <= now.timetz() < LUNCH_TO:
-        nxt = next_class(group, now)
-        if nxt:
-            when, entry = nxt
-            msg = f"🍴 *Lunch (13:30–14:30)*\n\n*Next {when.strftime('%H:%M')}*\n{pretty_entry(entry)}"
-        else:
-            msg = "🍴 *Lunch (13:30–14:30)*\n\nNo more classes today."
-        await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
-        return
-
-    # After last slot → next day
-    if now.timetz() >= SLOTS[-1][1]:
-        nxt = next_class(group, now)
-        if nxt:
-            when, entry = nxt
-            msg = f"No more classes today.\n\n*Next:* {when.strftime('%a %H:%M')}\n{pretty_entry(entry)}"
-        else:
-            msg = "No more classes today."
-        await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
-        return
-
-    # Within slot or between slots
-    cur = current_class(group, now)
-    if cur:
-        idx = slot_index_for(now)
-        start, end = SLOTS[idx]
-        msg = f"*Current* {pretty_slot_label(start, end)}\n{pretty_entry(cur)}"
-        await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
-    else:
-        nxt = next_class(group, now)
-        if nxt:
-            when, entry = nxt
-            msg = f"*Next {when.strftime('%H:%M')}*\n{pretty_entry(entry)}"
-        else:
-            msg = "No class right now."
-        await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
+    msg = _STATE_MSG[_classify(now)](c.group, now)
+    await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
 
 async def today(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _remember_chat(update)
-    group = USER_GROUP.get(update.effective_user.id, "Group-7")
-    d = ist_now().weekday()
-    text = f"*Today’s schedule for {group}:*\n\n" + day_schedule(group, d)
+    c = _ctx(update)
+    text = f"*Today’s schedule for {c.group}:*\n\n" + day_schedule(c.group, c.weekday)
     await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
 
 async def tomorrow(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _remember_chat(update)
-    group = USER_GROUP.get(update.effective_user.id, "Group-7")
-    d = (ist_now().weekday() + 1) % 7
-    text = f"*Tomorrow’s schedule for {group}:*\n\n" + day_schedule(group, d)
+    c = _ctx(update)
+    text = f"*Tomorrow’s schedule for {c.group}:*\n\n" + day_schedule(c.group, (c.weekday + 1) % 7)
     await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
 
 async def week(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _remember_chat(update)
-    group = USER_GROUP.get(update.effective_user.id, "Group-7")
-    labels = ["Mon","Tue","Wed","Thu","Fri","Sat","Sun"]
-    parts: List[str] = []
-    for d in range(7):
-        parts.append(f"*{labels[d]}*")
-        parts.append(day_schedule(group, d))
-        if d < 6:
-            parts.append("")  # extra blank line between days
-    await update.message.reply_text("\n".join(parts), parse_mode=ParseMode.MARKDOWN, disable_web_page_preview=True)
+    c = _ctx(update)
+    await update.message.reply_text(_WEEK_CACHE[c.group], parse_mode=ParseMode.MARKDOWN, disable_web_page_preview=True)
 
 async def next_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _remember_chat(update)
-    group = USER_GROUP.get(update.effective_user.id, "Group-7")
-    nxt = next_class(group, ist_now())
+    c = _ctx(update)
+    msg = update.message
+    nxt = next_class(c.group, ist_now())
     if not nxt:
-        await update.message.reply_text("No upcoming classes found.")
+        await msg.reply_text("No upcoming classes found.")
         return
     when, entry = nxt
-    msg = f"*Next class* {when.strftime('%a %H:%M')}\n{pretty_entry(entry)}"
-    await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
+    await msg.reply_text(
+        f"*Next class* {when.strftime('%a %H:%M')}\n{pretty_entry(entry)}",
+        parse_mode=ParseMode.MARKDOWN,
+    )
+
+# Subscribers per (date, slot): one timer per slot fans out to every chat
+# in the set, instead of one timer per subscriber per slot.
+SUBS: Dict[Tuple[str, int], Set[int]] = {}
 
 async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Schedules one-off reminders 10 minutes before each remaining class today."""
-    await _remember_chat(update)
-    user_id = update.effective_user.id
-    group = USER_GROUP.get(user_id, "Group-7")
-    now = ist_now()
-    day = now.weekday()
+    """Subscribes this chat to reminders 10 minutes before each remaining class today."""
+    c = _ctx(update)
+    group, chat_id, day = c.group, c.chat_id, c.weekday
+    today_date = c.date
+    date_key = today_date.isoformat()
     jobs = 0
-    for i, (start, _end) in enumerate(SLOTS):
-        slot_time = datetime.combine(now.date(), start).replace(tzinfo=TIMEZONE)
-        if slot_time <= now:
+    m_now = c.seconds // 60
+    for i, (start_m, _end_m) in enumerate(SLOT_MINUTES):
+        # Integer pre-check: only slots whose 10-minutes-before mark is
+        # still ahead of us get as far as building datetimes.
+        if start_m - 10 <= m_now:
             continue
-        entry = SUPPORTED_GROUPS[group][day][i]
+        entry = _FLAT_SCHEDULE[group][day * 7 + i]
         if not entry:
             continue
+        slot_time = _slot_dt(today_date, i)
         remind_at = slot_time - timedelta(minutes=10)
-        if remind_at <= now:
-            continue
-        context.job_queue.run_once(
-            reminder_job,
-            when=remind_at,
-            data={"chat_id": update.effective_chat.id, "entry": entry, "slot": (start.strftime('%H:%M'))},
-            name=f"reminder-{user_id}-{slot_time.isoformat()}",
-            chat_id=update.effective_chat.id,
-        )
+        key = (date_key, i)
+        subs = SUBS.get(key)
+        if subs is None:
+            # First subscriber for this slot today — schedule the shared timer.
+            SUBS[key] = {chat_id}
+            context.job_queue.run_once(
+                reminder_job,
+                when=remind_at,
+                data={"key": key, "entry": entry, "slot": _START_HHMM[i]},
+                name=f"reminder-{date_key}-{i}",
+            )
+        else:
+            subs.add(chat_id)
         jobs += 1
+    msg = update.message
     if jobs:
-        await update.message.reply_text(
+        await msg.reply_text(
             f"✅ Subscribed: I’ll remind you *10 minutes before* {jobs} class(es) today.",
             parse_mode=ParseMode.MARKDOWN
         )
     else:
-        await update.message.reply_text("No remaining classes to remind you about today.")
+        await msg.reply_text("No remaining classes to remind you about today.")
 
 async def reminder_job(context: CallbackContext):
     data = context.job.data
     entry: ClassEntry = data["entry"]
-    slot_label = data["slot"]
-    await context.bot.send_message(
-        chat_id=data["chat_id"],
-        text=f"⏰ *Reminder* ({slot_label})\n{pretty_entry(entry)}",
-        parse_mode=ParseMode.MARKDOWN,
-    )
+    text = f"⏰ *Reminder* ({data['slot']})\n{pretty_entry(entry)}"
+    chats = SUBS.pop(data["key"], ())
+
+    async def _send(cid: int):
+        try:
+            await context.bot.send_message(chat_id=cid, text=text, parse_mode=ParseMode.MARKDOWN)
+        except Exception:
+            pass
+
+    await asyncio.gather(*(_send(c) for c in chats))
 
 # ------------- Admin Broadcast -------------
 async def announce(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin-only: /announce <message> — broadcasts to all known chats."""
-    await _remember_chat(update)
-    user = update.effective_user
-    if user.id not in ADMIN_IDS:
-        await update.message.reply_text("You are not allowed to use /announce.")
+    _remember_chat(update)
+    msg = update.message
+    if update.effective_user.id not in ADMIN_IDS:
+        await msg.reply_text("You are not allowed to use /announce.")
         return
     if not context.args:
-        await update.message.reply_text("Usage: /announce <message>")
+        await msg.reply_text("Usage: /announce <message>")
         return
-    text = " ".join(context.args)
-    sent = 0
-    for chat_id in list(KNOWN_CHATS):
-        try:
-            await context.bot.send_message(chat_id=chat_id, text=f"📣 {text}")
-            sent += 1
-        except Exception:
-            pass
-    await update.message.reply_text(f"Announcement sent to {sent} chat(s).")
+    # Build the payload once — not once per chat.
+    full = f"📣 {' '.join(context.args)}"
+
+    # Fan the sends out concurrently instead of paying one round-trip per
+    # chat. The semaphore (held for ~1s per send) caps throughput at
+    # Telegram's global limit of 30 messages/sec.
+    sem = asyncio.Semaphore(30)
+
+    async def _send(chat_id: int) -> int:
+        async with sem:
+            try:
+                await context.bot.send_message(
+                    chat_id=chat_id,
+                    text=full,
+                    disable_web_page_preview=True,
+                )
+            except Exception:
+                return 0
+            await asyncio.sleep(1)
+            return 1
+
+    # Single immutable snapshot: chats that appear mid-broadcast wait for
+    # the next announcement, and the set is copied exactly once.
+    chats = tuple(KNOWN_CHATS)
+    results = await asyncio.gather(*(_send(c) for c in chats))
+    sent = sum(results)
+    await msg.reply_text(f"Announcement sent to {sent} chat(s).")
+
+# ------------- Command dispatch -------------
+# A single MessageHandler(filters.COMMAND) feeding this table replaces one
+# CommandHandler per command, so PTB checks one handler per update instead
+# of walking the whole registration list.
+_CMD_TABLE = {
+    "start": start,
+    "help": help_cmd,
+    "today": today,
+    "tomorrow": tomorrow,
+    "week": week,
+    "next": next_cmd,
+    "subscribe": subscribe,
+    "setgroup": setgroup,
+    "announce": announce,
+}
+
+async def dispatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    parts = (update.message.text or "").split()
+    if not parts:
+        return
+    # "/cmd@BotName arg ..." -> ("cmd", "BotName"). In group chats a
+    # mention addresses a specific bot — ignore commands meant for others,
+    # like the CommandHandler registrations this dispatcher replaced did.
+    cmd, _, mention = parts[0][1:].partition("@")
+    if mention and mention.lower() != context.bot.username.lower():
+        return
+    handler = _CMD_TABLE.get(cmd.lower())
+    if handler is None:
+        return
+    context.args = parts[1:]  # what CommandHandler would have filled in
+    await handler(update, context)
 
 
 
@@ -3,39 +3,54 @@ import os
 import asyncio
 from aiohttp import web
 from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
 
 from bot_core import (
-    start, help_cmd, today, next_cmd, subscribe, setgroup, text_router,
-    tomorrow, week, announce
+    dispatch_command, where_is_class, developer_reply, unknown_text,
+    load_state, state_flusher, flush_state
 )
 
 TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
 WEBHOOK_URL = os.environ["WEBHOOK_URL"]  # e.g. https://<service>.onrender.com/webhook
 PORT = int(os.environ.get("PORT", "10000"))  # Render provides PORT
 
+# Built application, memoized so calling build_ptb_app twice (e.g. from
+# tests) returns the same instance instead of registering a second set of
+# handlers — duplicated handlers mean duplicated replies.
+_ptb_app = None
+
 async def build_ptb_app():
-    app = ApplicationBuilder().token(TOKEN).build()
-
-    # Handlers
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("help", help_cmd))
-    app.add_handler(CommandHandler("today", today))
-    app.add_handler(CommandHandler("tomorrow", tomorrow))
-    app.add_handler(CommandHandler("week", week))
-    app.add_handler(CommandHandler("next", next_cmd))
-    app.add_handler(CommandHandler("subscribe", subscribe))
-    app.add_handler(CommandHandler("setgroup", setgroup))
-    app.add_handler(CommandHandler("announce", announce))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_router))
+    global _ptb_app
+    if _ptb_app is not None:
+        return _ptb_app
+
+    # concurrent_updates lets PTB process webhook updates in parallel
+    # instead of strictly one at a time.
+    app = ApplicationBuilder().token(TOKEN).concurrent_updates(True).build()
+
+    # Handlers: all commands go through one dispatcher (O(1) dict lookup
+    # in bot_core instead of one CommandHandler check per command). Text
+    # intents are matched by the dispatcher's compiled-regex filters, so a
+    # coroutine only runs for messages that actually match.
+    app.add_handler(MessageHandler(filters.COMMAND, dispatch_command))
+    app.add_handler(MessageHandler(filters.Regex(r"(?i)where is the class"), where_is_class))
+    app.add_handler(MessageHandler(filters.Regex(r"(?i)who is the developer"), developer_reply))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, unknown_text))
+    _ptb_app = app
     return app
 
 async def main():
+    # 0) Restore known chats / user groups from the previous run
+    load_state()
+
     # 1) Build PTB application and start it (this starts JobQueue too)
     ptb = await build_ptb_app()
     await ptb.initialize()
     await ptb.start()
 
+    # Background writer that batches state changes to disk
+    flusher = asyncio.create_task(state_flusher())
+
     # 2) Set Telegram webhook to our public URL
     await ptb.bot.set_webhook(WEBHOOK_URL, drop_pending_updates=True)
 
@@ -57,6 +72,10 @@ async def main():
 
     # Clean shutdown PTB when server stops
     async def on_cleanup(_app):
+        # Drain anything queued since the last interval before stopping the
+        # background writer, so a clean shutdown loses no registrations.
+        await flush_state()
+        flusher.cancel()
         await ptb.stop()
         await ptb.shutdown()
 